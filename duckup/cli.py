@@ -1,18 +1,34 @@
 #!/usr/bin/env python
 
 import argparse
+import functools
 import logging
 import os
 import sys
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import duckdb
 from duckup import MigrationError, downgrade, upgrade
-from duckup.migrate import load_migrations
+from duckup.migrate import MIGRATION_FILE_PATTERN, scan_migrations
 
 logger = logging.getLogger()
 
+MIGRATION_TEMPLATE = '''"""
+{name} migration.
+"""
+
+from duckdb import DuckDBPyConnection
+
+
+def upgrade(conn: DuckDBPyConnection) -> None:
+    pass
+
+
+def downgrade(conn: DuckDBPyConnection) -> None:
+    pass
+'''
+
 
 class Command:
     def __init__(self, name: str, help: str) -> None:
@@ -101,12 +117,26 @@ class UpgradeCommand(Command):
             type=int,
             help="Version number to upgrade to (default: latest)",
         )
+        self.parser.add_argument(
+            "--batch-size",
+            "-b",
+            dest="batch_size",
+            metavar="BATCH_SIZE",
+            type=int,
+            default=1,
+            help=(
+                "Number of migrations applied per transaction, 0 or less "
+                "applies all in one transaction (default: %(default)s)"
+            ),
+        )
 
     def run(self, args: argparse.Namespace) -> None:
         logger.info("Upgrading database %s", args.database)
         conn = duckdb.connect(args.database)
         try:
-            upgrade(conn, args.directory, args.table, args.version)
+            upgrade(
+                conn, args.directory, args.table, args.version, args.batch_size
+            )
             logger.info("Database upgraded successfully")
         except MigrationError as e:
             logger.error("Error upgrading database: %s", e)
@@ -155,6 +185,18 @@ class DowngradeCommand(Command):
             default="migrations",
             help="Table name for tracking migration versions",
         )
+        self.parser.add_argument(
+            "--batch-size",
+            "-b",
+            dest="batch_size",
+            metavar="BATCH_SIZE",
+            type=int,
+            default=1,
+            help=(
+                "Number of migrations reverted per transaction, 0 or less "
+                "reverts all in one transaction (default: %(default)s)"
+            ),
+        )
 
     def run(self, args: argparse.Namespace) -> None:
         logger.info(
@@ -162,7 +204,9 @@ class DowngradeCommand(Command):
         )
         conn = duckdb.connect(args.database)
         try:
-            downgrade(conn, args.directory, args.table, args.version)
+            downgrade(
+                conn, args.directory, args.table, args.version, args.batch_size
+            )
             logger.info("Database downgraded successfully")
         except MigrationError as e:
             logger.error("Error downgrading database: %s", e)
@@ -191,23 +235,19 @@ class ListCommand(Command):
 
     def run(self, args: argparse.Namespace) -> None:
         try:
-            migrations = load_migrations(args.directory)
+            migrations = scan_migrations(args.directory)
             if not migrations:
                 logger.info(
                     "No migrations found in directory %s", args.directory
                 )
                 return
 
-            logger.info("Available migrations:")
-            for migration in sorted(migrations, key=lambda m: m.version):
-                module_file = getattr(migration.module, "__file__", "Unknown")
-                file_name = Path(module_file).name if module_file else "Unknown"
-                logger.info(
-                    "Version %03d: %s (%s)",
-                    migration.version,
-                    migration.name,
-                    file_name,
-                )
+            # Emit the whole listing as a single log record
+            lines = [
+                f"Version {m.version:03d}: {m.name} ({m.path.name})"
+                for m in migrations
+            ]
+            logger.info("Available migrations:\n%s", "\n".join(lines))
         except MigrationError as e:
             logger.error("Error listing migrations: %s", e)
             sys.exit(1)
@@ -223,40 +263,29 @@ def create_migration(directory: str, name: str) -> None:
         logger.info("Creating migrations directory: %s", directory)
         os.makedirs(directory_path)
 
-    highest_version = 0
-    for item in directory_path.glob("*.py"):
-        try:
-            version = int(item.name.split("_")[0])
-            highest_version = max(highest_version, version)
-        except (ValueError, IndexError):
-            pass
+    with os.scandir(directory_path) as entries:
+        versions = [
+            int(match.group(1))
+            for entry in entries
+            if (match := MIGRATION_FILE_PATTERN.match(entry.name))
+        ]
+    highest_version = max(versions, default=0)
 
     new_version = highest_version + 1
     file_name = f"{new_version:03d}_{name}.py"
     file_path = directory_path / file_name
 
-    with open(file_path, "w") as f:
-        f.write(
-            f'''"""
-{name} migration.
-"""
-
-from duckdb import DuckDBPyConnection
-
-
-def upgrade(conn: DuckDBPyConnection) -> None:
-    pass
-
-
-def downgrade(conn: DuckDBPyConnection) -> None:
-    pass
-'''
-        )
+    file_path.write_text(MIGRATION_TEMPLATE.format(name=name))
 
     logger.info("Created migration file: %s", file_path)
 
 
-def main() -> None:
+@functools.lru_cache(maxsize=1)
+def build_parser() -> Tuple[argparse.ArgumentParser, Dict[str, Command]]:
+    """Build the argument parser and its commands.
+
+    The result is cached, so the parser is only built once per process.
+    """
     parser = argparse.ArgumentParser(
         description="DuckDB migration tool.",
     )
@@ -293,6 +322,11 @@ def main() -> None:
     for cmd in commands.values():
         cmd.setup_parser(subparsers)
 
+    return parser, commands
+
+
+def main() -> None:
+    parser, commands = build_parser()
     args = parser.parse_args()
 
     log_level = logging.INFO
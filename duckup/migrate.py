@@ -6,6 +6,7 @@ import time
 from dataclasses import dataclass
 from pathlib import Path
 from types import ModuleType
+from typing import Iterator, Optional
 
 from duckdb import DuckDBPyConnection as DBConn
 
@@ -13,6 +14,13 @@ from . import queries
 
 logger = logging.getLogger("duckup")
 
+# Migration files are named like 001_initial_schema.py
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(.*)\.py$")
+
+# Imported migration modules by file path, with the mtime and size of the
+# file they were imported from
+_module_cache: dict[str, tuple[int, int, ModuleType]] = {}
+
 
 class MigrationError(Exception):
     pass
@@ -37,11 +45,19 @@ class Migration:
     name: str
 
 
+@dataclass
+class MigrationInfo:
+    version: int
+    name: str
+    path: Path
+
+
 def upgrade(
     conn: DBConn,
     migrations_dir: str,
     migrations_table: str = "migrations",
     target_version: int = None,
+    batch_size: int = 1,
 ) -> None:
     migrations = load_migrations(migrations_dir)
     if not migrations:
@@ -59,7 +75,7 @@ def upgrade(
 
     # If target_version is None, we'll upgrade to the latest version
     if target_version is None:
-        target_version = max(m.version for m in migrations)
+        target_version = migrations[-1].version
         logger.info(
             "Target version not specified, using latest: %d", target_version
         )
@@ -87,9 +103,7 @@ def upgrade(
 
     # Count migrations to be applied
     to_apply = [
-        m
-        for m in sorted(migrations, key=lambda m: m.version)
-        if db_version < m.version <= target_version
+        m for m in migrations if db_version < m.version <= target_version
     ]
     if not to_apply:
         logger.info("No migrations to apply")
@@ -102,82 +116,78 @@ def upgrade(
 
     logger.info("Applying %d migration(s)", len(to_apply))
 
-    for migration in sorted(migrations, key=lambda m: m.version):
-        if migration.version <= db_version:
-            logger.debug(
-                "Skipping migration %s (version %03d): already applied",
-                migration.name,
-                migration.version,
-            )
-            continue
-        if migration.version > target_version:
-            logger.debug(
-                "Skipping migration %s (version %03d): beyond target version "
-                "%03d",
-                migration.name,
-                migration.version,
-                target_version,
-            )
+    for m in migrations:
+        if m.version > db_version:
             break
-
-        logger.info(
-            "Applying migration: %s (version %03d)",
-            migration.name,
-            migration.version,
+        logger.debug(
+            "Skipping migration %s (version %03d): already applied",
+            m.name,
+            m.version,
         )
 
-        # Debug log source code of the migration if available
-        try:
-            module_file = migration.module.__file__
-            if module_file and logger.isEnabledFor(logging.DEBUG):
-                with open(module_file, "r") as f:
+    for batch in _batches(to_apply, batch_size):
+        with queries.transaction(conn):
+            if len(batch) == 1:
+                logger.debug(
+                    "Beginning transaction for migration %s", batch[0].name
+                )
+            else:
+                logger.debug(
+                    "Beginning transaction for migrations: %s",
+                    ", ".join(m.name for m in batch),
+                )
+
+            for migration in batch:
+                logger.info(
+                    "Applying migration: %s (version %03d)",
+                    migration.name,
+                    migration.version,
+                )
+                _log_source(migration, "Migration")
+
+                # Start timing the execution
+                start_time = time.time()
+
+                # Execute the migration
+                try:
+                    migration.module.upgrade(conn)
+                    execution_time = time.time() - start_time
                     logger.debug(
-                        "Migration source for %s (version %03d):\n%s",
+                        "Migration %s (version %03d) executed in %.2f seconds",
                         migration.name,
                         migration.version,
-                        f.read(),
+                        execution_time,
                     )
-        except (AttributeError, FileNotFoundError, IOError):
-            logger.debug(
-                "Could not read source for migration %s (version %03d)",
-                migration.name,
-                migration.version,
-            )
-
-        with queries.transaction(conn):
-            logger.debug(
-                "Beginning transaction for migration %s", migration.name
-            )
-
-            # Start timing the execution
-            start_time = time.time()
+                except Exception as e:
+                    logger.error(
+                        "Error executing migration %s (version %03d): %s",
+                        migration.name,
+                        migration.version,
+                        str(e),
+                    )
+                    raise
 
-            # Execute the migration
-            try:
-                migration.module.upgrade(conn)
-                execution_time = time.time() - start_time
-                logger.debug(
-                    "Migration %s (version %03d) executed in %.2f seconds",
-                    migration.name,
-                    migration.version,
-                    execution_time,
+                # Update the version in the database
+                queries.update_version(
+                    conn, migrations_table, migration.version
                 )
-            except Exception as e:
-                logger.error(
-                    "Error executing migration %s (version %03d): %s",
-                    migration.name,
+                logger.debug(
+                    "Updated database version to %d in %s table",
                     migration.version,
-                    str(e),
+                    migrations_table,
                 )
-                raise
 
-            # Update the version in the database
-            queries.update_version(conn, migrations_table, migration.version)
+    # Migrations are sorted, so only the first one beyond the target is logged
+    for m in migrations:
+        if m.version > target_version:
             logger.debug(
-                "Updated database version to %d in %s table",
-                migration.version,
-                migrations_table,
+                "Skipping migration %s (version %03d): beyond target version "
+                "%03d",
+                m.name,
+                m.version,
+                target_version,
             )
+            break
 
     logger.info("Database upgrade complete. Final version: %d", target_version)
 
@@ -187,6 +197,7 @@ def downgrade(
     migrations_dir: str,
     migrations_table: str = "migrations",
     target_version: int = None,
+    batch_size: int = 1,
 ) -> None:
     migrations = load_migrations(migrations_dir)
     if not migrations:
@@ -234,7 +245,7 @@ def downgrade(
     # Count migrations to be downgraded
     to_apply = [
         m
-        for m in sorted(migrations, key=lambda m: m.version, reverse=True)
+        for m in reversed(migrations)
         if target_version < m.version <= db_version
     ]
     if not to_apply:
@@ -248,162 +259,241 @@ def downgrade(
 
     logger.info("Downgrading %d migration(s)", len(to_apply))
 
-    for migration in sorted(migrations, key=lambda m: m.version, reverse=True):
-        if migration.version <= target_version:
-            logger.debug(
-                "Skipping downgrade of migration %s (version %03d): "
-                "at or below target",
-                migration.name,
-                migration.version,
-            )
+    for m in reversed(migrations):
+        if m.version <= db_version:
             break
-        if migration.version > db_version:
-            logger.debug(
-                "Skipping downgrade of migration %s (version %03d): "
-                "beyond current version %d",
-                migration.name,
-                migration.version,
-                db_version,
-            )
-            continue
-
-        logger.info(
-            "Reverting migration: %s (version %03d)",
-            migration.name,
-            migration.version,
+        logger.debug(
+            "Skipping downgrade of migration %s (version %03d): "
+            "beyond current version %d",
+            m.name,
+            m.version,
+            db_version,
         )
 
-        # Debug log source code of the migration if available
-        try:
-            module_file = migration.module.__file__
-            if module_file and logger.isEnabledFor(logging.DEBUG):
-                with open(module_file, "r") as f:
-                    logger.debug(
-                        "Downgrade source for %s (version %03d):\n%s",
-                        migration.name,
-                        migration.version,
-                        f.read(),
-                    )
-        except (AttributeError, FileNotFoundError, IOError):  # pragma: no cover
-            logger.debug(
-                "Could not read source for migration %s (version %03d)",
-                migration.name,
-                migration.version,
-            )
+    # Map each migration version to the last migration with a lower version
+    previous: dict[int, Optional[Migration]] = {}
+    below: Optional[Migration] = None
+    for m in migrations:
+        previous.setdefault(m.version, below)
+        below = m
 
+    for batch in _batches(to_apply, batch_size):
         with queries.transaction(conn):
-            logger.debug(
-                "Beginning transaction for reverting migration %s",
-                migration.name,
-            )
-
-            # Start timing the execution
-            start_time = time.time()
-
-            # Execute the downgrade
-            try:
-                migration.module.downgrade(conn)
-                execution_time = time.time() - start_time
+            if len(batch) == 1:
                 logger.debug(
-                    "Migration %s (version %03d) downgrade executed in %.2f "
-                    "seconds",
-                    migration.name,
-                    migration.version,
-                    execution_time,
+                    "Beginning transaction for reverting migration %s",
+                    batch[0].name,
                 )
-            except Exception as e:
-                logger.error(
-                    "Error reverting migration %s (version %03d): %s",
+            else:
+                logger.debug(
+                    "Beginning transaction for reverting migrations: %s",
+                    ", ".join(m.name for m in batch),
+                )
+
+            for migration in batch:
+                logger.info(
+                    "Reverting migration: %s (version %03d)",
                     migration.name,
                     migration.version,
-                    str(e),
                 )
-                raise
+                _log_source(migration, "Downgrade")
 
-            # Find the previous version to downgrade to
-            prev_version = 0  # Default to 0 if no earlier migration exists
-            prev_name = None
-            for m in sorted(migrations, key=lambda m: m.version):
-                if m.version >= migration.version:
-                    break
-                prev_version = m.version
-                prev_name = m.name
+                # Start timing the execution
+                start_time = time.time()
 
-            logger.debug(
-                "Found previous migration: %s (version %03d)",
-                prev_name if prev_name else "None",
-                prev_version,
-            )
+                # Execute the downgrade
+                try:
+                    migration.module.downgrade(conn)
+                    execution_time = time.time() - start_time
+                    logger.debug(
+                        "Migration %s (version %03d) downgrade executed in "
+                        "%.2f seconds",
+                        migration.name,
+                        migration.version,
+                        execution_time,
+                    )
+                except Exception as e:
+                    logger.error(
+                        "Error reverting migration %s (version %03d): %s",
+                        migration.name,
+                        migration.version,
+                        str(e),
+                    )
+                    raise
+
+                # Find the previous version to downgrade to
+                prev_migration = previous[migration.version]
+                # Default to 0 if no earlier migration exists
+                prev_version = prev_migration.version if prev_migration else 0
+                prev_name = prev_migration.name if prev_migration else None
 
-            # If we're at the target version or below, use target_version
-            if prev_version <= target_version:
-                prev_version = target_version
                 logger.debug(
-                    "Using target version %03d as previous version",
-                    target_version,
+                    "Found previous migration: %s (version %03d)",
+                    prev_name if prev_name else "None",
+                    prev_version,
                 )
 
-            queries.update_version(conn, migrations_table, prev_version)
+                # If we're at the target version or below, use target_version
+                if prev_version <= target_version:
+                    prev_version = target_version
+                    logger.debug(
+                        "Using target version %03d as previous version",
+                        target_version,
+                    )
+
+                queries.update_version(conn, migrations_table, prev_version)
+                logger.debug(
+                    "Updated database version to %d in %s table",
+                    prev_version,
+                    migrations_table,
+                )
+
+    # Migrations are sorted, so only the first one kept is logged
+    for m in reversed(migrations):
+        if m.version <= target_version:
             logger.debug(
-                "Updated database version to %d in %s table",
-                prev_version,
-                migrations_table,
+                "Skipping downgrade of migration %s (version %03d): "
+                "at or below target",
+                m.name,
+                m.version,
             )
+            break
 
     logger.info(
         "Database downgrade complete. Final version: %d", target_version
     )
 
 
-def load_migrations(migrations_dir: str) -> list[Migration]:
-    """Load migration modules from the given directory.
+def _batches(
+    migrations: list[Migration], batch_size: int
+) -> Iterator[list[Migration]]:
+    """Split migrations into batches that share a single transaction.
 
-    Migrations files should be named like: 001_initial_schema.py,
-    002_add_users.py, etc. The version is extracted from the filename.
+    A batch size of 0 or less puts all migrations into one batch.
     """
-    logger.debug("Loading migrations from directory: %s", migrations_dir)
-    migrations = []
-    migration_pattern = re.compile(r"^(\d+)_(.*)\.py$")
+    if batch_size <= 0:
+        batch_size = len(migrations)
+    for i in range(0, len(migrations), batch_size):
+        yield migrations[i : i + batch_size]
+
+
+def _log_source(migration: Migration, label: str) -> None:
+    """Debug log source code of the migration if available."""
+    try:
+        module_file = migration.module.__file__
+        if module_file and logger.isEnabledFor(logging.DEBUG):
+            with open(module_file, "r") as f:
+                logger.debug(
+                    "%s source for %s (version %03d):\n%s",
+                    label,
+                    migration.name,
+                    migration.version,
+                    f.read(),
+                )
+    except (AttributeError, FileNotFoundError, IOError):
+        logger.debug(
+            "Could not read source for migration %s (version %03d)",
+            migration.name,
+            migration.version,
+        )
+
+
+def _load_module(path: Path, version: int) -> ModuleType:
+    """Import a migration module from the given file.
+
+    Modules are cached by path and reused while the file's modification time
+    and size are unchanged, so repeated loads of an unchanged migration do
+    not execute it again. Only the latest import of each file is kept.
+
+    Raises MigrationFileError if no module spec can be created. Failed
+    loads are not cached.
+    """
+    file_path = str(path.absolute())
+    stat = path.stat()
+    cached = _module_cache.get(file_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    spec = importlib.util.spec_from_file_location(
+        f"migration_{version}", file_path
+    )
+    if spec is None or spec.loader is None:
+        raise MigrationFileError(f"Cannot create module spec for {file_path}")
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _module_cache[file_path] = (stat.st_mtime_ns, stat.st_size, module)
+    return module
 
+
+def scan_migrations(migrations_dir: str) -> list[MigrationInfo]:
+    """Find migration files in the given directory without importing them.
+
+    Migrations files should be named like: 001_initial_schema.py,
+    002_add_users.py, etc. The version and name are extracted from the
+    filename. The returned list is ordered by version.
+    """
     migrations_path = Path(migrations_dir)
-    if not migrations_path.exists():
-        logger.error("Migrations directory does not exist: %s", migrations_dir)
-        raise MigrationDirectoryError(
-            f"Migrations directory {migrations_dir} does not exist"
-        )
     if not migrations_path.is_dir():
+        if not migrations_path.exists():
+            logger.error(
+                "Migrations directory does not exist: %s", migrations_dir
+            )
+            raise MigrationDirectoryError(
+                f"Migrations directory {migrations_dir} does not exist"
+            )
         logger.error("Path exists but is not a directory: %s", migrations_dir)
         raise MigrationDirectoryError(
             f"{migrations_dir} exists but is not a directory"
         )
 
+    migrations = []
     for filename in sorted(os.listdir(migrations_path)):
-        match = migration_pattern.match(filename)
+        match = MIGRATION_FILE_PATTERN.match(filename)
         if not match:
             logger.debug("Skipping non-migration file: %s", filename)
             continue
 
         version = int(match.group(1))
         migration_name = match.group(2)
-        file_path = migrations_path / filename
         logger.debug(
             "Found migration file: %s (version %d, name: %s)",
             filename,
             version,
             migration_name,
         )
-
-        # Load the module
-        spec = importlib.util.spec_from_file_location(
-            f"migration_{version}", file_path
+        migrations.append(
+            MigrationInfo(
+                version=version,
+                name=migration_name,
+                path=migrations_path / filename,
+            )
         )
-        if spec is None or spec.loader is None:
+
+    # Order by the numeric version, not lexically by filename
+    migrations.sort(key=lambda m: (m.version, m.path.name))
+    return migrations
+
+
+def load_migrations(migrations_dir: str) -> list[Migration]:
+    """Load migration modules from the given directory.
+
+    Migration files are found with scan_migrations() and imported in
+    version order.
+    """
+    logger.debug("Loading migrations from directory: %s", migrations_dir)
+    migrations = []
+
+    for info in scan_migrations(migrations_dir):
+        filename = info.path.name
+
+        # Load the module (unchanged files are served from the cache)
+        try:
+            module = _load_module(info.path, info.version)
+        except MigrationFileError:
             logger.warning("Could not load migration file: %s", filename)
             continue
 
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-
         # Check that the module has the required functions
         if not hasattr(module, "upgrade") or not hasattr(module, "downgrade"):
             logger.error(
@@ -417,7 +507,7 @@ def load_migrations(migrations_dir: str) -> list[Migration]:
             )
 
         migrations.append(
-            Migration(version=version, module=module, name=migration_name)
+            Migration(version=info.version, module=module, name=info.name)
         )
 
     logger.debug("Found %d migrations", len(migrations))
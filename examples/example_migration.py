@@ -6,6 +6,11 @@ This example shows:
 1. Setting up logging
 2. Running database upgrades
 3. Running database downgrades
+
+See example_migrations/001_create_users.py for seeding a table: rows are
+inserted with a single executemany() call rather than one INSERT per row.
+For large seed datasets prefer DuckDB's bulk paths (e.g. INSERT ... SELECT
+from a registered DataFrame or read_csv) over per-row statements.
 """
 
 import logging
@@ -32,6 +37,8 @@ def main(db_path: str, migration_dir: str) -> None:
         conn = duckdb.connect(db_path)
 
         # Run upgrade
+        # NOTE: duckup runs each migration inside its own transaction, so
+        # do not call upgrade/downgrade while a transaction is already open
         logger.info("Running upgrade...")
         duckup.upgrade(conn, migration_dir)
 
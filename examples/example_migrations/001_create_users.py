@@ -4,10 +4,15 @@ create_users migration.
 
 from duckdb import DuckDBPyConnection
 
+USERS = [
+    (1, "John Doe"),
+]
+
 
 def upgrade(conn: DuckDBPyConnection) -> None:
     conn.execute("CREATE TABLE users (id INTEGER, name VARCHAR)")
-    conn.execute("INSERT INTO users (id, name) VALUES (1, 'John Doe')")
+    # Insert seed rows in one batch instead of one statement per row
+    conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)", USERS)
 
 
 def downgrade(conn: DuckDBPyConnection) -> None:
@@ -1,8 +1,10 @@
+import argparse
 import logging
+import os
 import shutil
 import tempfile
 from pathlib import Path
-from typing import Generator
+from typing import Any, Generator, List
 from unittest.mock import Mock, patch
 
 import pytest
@@ -13,9 +15,31 @@ from duckup.cli import (
     DowngradeCommand,
     ListCommand,
     UpgradeCommand,
+    build_parser,
     create_migration,
     main,
 )
+from duckup.migrate import MigrationInfo
+
+
+def make_args(**kwargs: Any) -> argparse.Namespace:
+    """Build parsed command arguments, overriding the defaults with kwargs."""
+    defaults = {
+        "database": "test.db",
+        "directory": "migrations",
+        "table": "migrations",
+        "version": None,
+        "batch_size": 1,
+    }
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+def py_files(directory: str) -> List[str]:
+    """Return names of the Python files in the given directory."""
+    with os.scandir(directory) as entries:
+        return [
+            e.name for e in entries if e.name.endswith(".py") and e.is_file()
+        ]
 
 
 class TestCommand:
@@ -47,18 +71,15 @@ class TestCreateMigrationCommand:
                 ["duckup", "create", "test_migration", "--dir", tmp_dir],
             ):
                 # Mock the args
-                args = type(
-                    "Args", (), {"directory": tmp_dir, "name": "test_migration"}
-                )()
+                args = make_args(directory=tmp_dir, name="test_migration")
                 cmd.run(args)
 
             # Check that the migration file was created
-            migration_files = list(Path(tmp_dir).glob("*.py"))
-            assert len(migration_files) == 1
-            assert migration_files[0].name == "001_test_migration.py"
+            migration_files = py_files(tmp_dir)
+            assert migration_files == ["001_test_migration.py"]
 
             # Verify file contents
-            with open(migration_files[0], "r") as f:
+            with open(Path(tmp_dir) / migration_files[0], "r") as f:
                 content = f.read()
                 assert "test_migration migration." in content
                 assert "def upgrade(conn: DuckDBPyConnection)" in content
@@ -82,9 +103,8 @@ class TestCreateMigrationCommand:
                 assert nonexistent_dir.exists()
 
                 # Check that the migration file was created
-                migration_files = list(nonexistent_dir.glob("*.py"))
-                assert len(migration_files) == 1
-                assert migration_files[0].name == "001_test_migration.py"
+                migration_files = py_files(str(nonexistent_dir))
+                assert migration_files == ["001_test_migration.py"]
             finally:
                 # Clean up
                 if nonexistent_dir.exists():
@@ -100,16 +120,7 @@ class TestUpgradeCommand:
         """Test the upgrade command."""
         cmd = UpgradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": None,
-            },
-        )()
+        args = make_args()
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -120,7 +131,7 @@ class TestUpgradeCommand:
         mock_connect.assert_called_once_with("test.db")
         # Assert upgrade was called with right params
         mock_upgrade.assert_called_once_with(
-            mock_conn, "migrations", "migrations", None
+            mock_conn, "migrations", "migrations", None, 1
         )
         # Assert connection was closed
         mock_conn.close.assert_called_once()
@@ -134,16 +145,7 @@ class TestUpgradeCommand:
         """Test the upgrade command when an error occurs."""
         cmd = UpgradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": None,
-            },
-        )()
+        args = make_args()
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -173,16 +175,7 @@ class TestUpgradeCommand:
         """Test the upgrade command when an unhandled error occurs."""
         cmd = UpgradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": None,
-            },
-        )()
+        args = make_args()
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -213,16 +206,7 @@ class TestDowngradeCommand:
         """Test the downgrade command."""
         cmd = DowngradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": 1,
-            },
-        )()
+        args = make_args(version=1)
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -233,7 +217,7 @@ class TestDowngradeCommand:
         mock_connect.assert_called_once_with("test.db")
         # Assert downgrade was called with right params
         mock_downgrade.assert_called_once_with(
-            mock_conn, "migrations", "migrations", 1
+            mock_conn, "migrations", "migrations", 1, 1
         )
         # Assert connection was closed
         mock_conn.close.assert_called_once()
@@ -247,16 +231,7 @@ class TestDowngradeCommand:
         """Test the downgrade command when an error occurs."""
         cmd = DowngradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": 1,
-            },
-        )()
+        args = make_args(version=1)
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -286,16 +261,7 @@ class TestDowngradeCommand:
         """Test the downgrade command when an unhandled error occurs."""
         cmd = DowngradeCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "database": "test.db",
-                "directory": "migrations",
-                "table": "migrations",
-                "version": 1,
-            },
-        )()
+        args = make_args(version=1)
 
         # Mock connection
         mock_conn = mock_connect.return_value
@@ -318,102 +284,74 @@ class TestDowngradeCommand:
 
 
 class TestListCommand:
-    @patch("duckup.cli.load_migrations")
-    def test_list_command(self, mock_load_migrations: Mock) -> None:
+    @patch("duckup.cli.scan_migrations")
+    def test_list_command(self, mock_scan_migrations: Mock) -> None:
         """Test the list command."""
         # Create test migrations with proper attributes
-        mock1 = Mock()
-        mock1.version = 1
-        mock1.name = "initial_schema"
-        mock1.module = Mock()
-        mock1.module.__file__ = "/path/to/001_initial_schema.py"
-
-        mock2 = Mock()
-        mock2.version = 2
-        mock2.name = "add_users"
-        mock2.module = Mock()
-        mock2.module.__file__ = "/path/to/002_add_users.py"
-
-        mock_migrations = [mock1, mock2]
-        mock_load_migrations.return_value = mock_migrations
+        mock_migrations = [
+            MigrationInfo(
+                version=1,
+                name="initial_schema",
+                path=Path("/path/to/001_initial_schema.py"),
+            ),
+            MigrationInfo(
+                version=2,
+                name="add_users",
+                path=Path("/path/to/002_add_users.py"),
+            ),
+        ]
+        mock_scan_migrations.return_value = mock_migrations
 
         cmd = ListCommand()
         # Mock the args
-        args = type(
-            "Args",
-            (),
-            {
-                "directory": "migrations",
-            },
-        )()
+        args = make_args()
 
         with patch("duckup.cli.logger") as mock_logger:
             cmd.run(args)
 
-            # Verify load_migrations was called with the right directory
-            mock_load_migrations.assert_called_once_with("migrations")
-
-            # Verify logger.info was called for each migration
-            assert mock_logger.info.call_count >= 3  # Header + 2 migrations
-            mock_logger.info.assert_any_call("Available migrations:")
-            mock_logger.info.assert_any_call(
-                "Version %03d: %s (%s)",
-                1,
-                "initial_schema",
-                "001_initial_schema.py",
-            )
-            mock_logger.info.assert_any_call(
-                "Version %03d: %s (%s)",
-                2,
-                "add_users",
-                "002_add_users.py",
+            # Verify scan_migrations was called with the right directory
+            mock_scan_migrations.assert_called_once_with("migrations")
+
+            # Verify the listing was logged as a single record
+            mock_logger.info.assert_called_once_with(
+                "Available migrations:\n%s",
+                "Version 001: initial_schema (001_initial_schema.py)\n"
+                "Version 002: add_users (002_add_users.py)",
             )
 
-    @patch("duckup.cli.load_migrations")
+    @patch("duckup.cli.scan_migrations")
     def test_list_command_no_migrations(
-        self, mock_load_migrations: Mock
+        self, mock_scan_migrations: Mock
     ) -> None:
         """Test the list command when no migrations are found."""
-        mock_load_migrations.return_value = []
+        mock_scan_migrations.return_value = []
 
         cmd = ListCommand()
-        args = type(
-            "Args",
-            (),
-            {
-                "directory": "empty_dir",
-            },
-        )()
+        args = make_args(directory="empty_dir")
 
         with patch("duckup.cli.logger") as mock_logger:
             cmd.run(args)
 
-            # Verify load_migrations was called
-            mock_load_migrations.assert_called_once_with("empty_dir")
+            # Verify scan_migrations was called
+            mock_scan_migrations.assert_called_once_with("empty_dir")
 
             # Verify appropriate message was logged
             mock_logger.info.assert_called_once_with(
                 "No migrations found in directory %s", "empty_dir"
             )
 
-    @patch("duckup.cli.load_migrations")
+    @patch("duckup.cli.scan_migrations")
     @patch("duckup.cli.sys.exit")
     def test_list_command_error(
-        self, mock_exit: Mock, mock_load_migrations: Mock
+        self, mock_exit: Mock, mock_scan_migrations: Mock
     ) -> None:
         """Test the list command when an error occurs."""
-        # Simulate an error during loading migrations
+        # Simulate an error during scanning migrations
         error = MigrationError("Test error")
-        mock_load_migrations.side_effect = error
+        mock_scan_migrations.side_effect = error
 
         cmd = ListCommand()
-        args = type(
-            "Args",
-            (),
-            {
-                "directory": "migrations",
-            },
-        )()
+        args = make_args()
 
         # Make sys.exit raise SystemExit to stop execution
         mock_exit.side_effect = SystemExit(1)
@@ -433,6 +371,17 @@ class TestListCommand:
 
 
 class TestMainFunction:
+    def test_build_parser_cached(self) -> None:
+        """Test that the parser is built once and reused."""
+        parser, commands = build_parser()
+        assert build_parser() == (parser, commands)
+        assert set(commands) == {"create", "list", "upgrade", "downgrade"}
+
+        args = parser.parse_args(["upgrade", "test.db", "--batch-size", "5"])
+        assert args.command == "upgrade"
+        assert args.database == "test.db"
+        assert args.batch_size == 5
+
     @patch("duckup.cli.sys.exit")
     @patch("duckup.cli.argparse.ArgumentParser.parse_args")
     def test_main_no_command(
@@ -618,8 +567,7 @@ def test_create_migration_highest_version(temp_migrations_dir: str) -> None:
     ]
 
     for filename in migrations:
-        with open(dir_path / filename, "w") as f:
-            f.write("# Test file")
+        (dir_path / filename).write_text("# Test file")
 
     # Run create_migration function
     create_migration(temp_migrations_dir, "new_migration")
@@ -642,8 +590,7 @@ def test_create_migration_with_negative_version(
     dir_path = Path(temp_migrations_dir)
 
     # Create a migration file with negative version
-    with open(dir_path / "-01_negative.py", "w") as f:
-        f.write("# Negative version file")
+    (dir_path / "-01_negative.py").write_text("# Negative version file")
 
     # Run create_migration function
     create_migration(temp_migrations_dir, "after_negative")
@@ -664,8 +611,9 @@ def test_create_migration_with_large_version(temp_migrations_dir: str) -> None:
     # Create a migration file with a very large version number (beyond int32)
     # Just beyond int32 max (2,147,483,647)
     large_version = 2_147_483_648
-    with open(dir_path / f"{large_version}_large_int.py", "w") as f:
-        f.write("# Large integer version file")
+    (dir_path / f"{large_version}_large_int.py").write_text(
+        "# Large integer version file"
+    )
 
     # Run create_migration function
     create_migration(temp_migrations_dir, "after_large")
@@ -685,12 +633,10 @@ def test_create_migration_with_float_version(temp_migrations_dir: str) -> None:
 
     # Create a migration file with a float version
     # (this will be ignored as it won't parse as int)
-    with open(dir_path / "1.5_float_version.py", "w") as f:
-        f.write("# Float version file")
+    (dir_path / "1.5_float_version.py").write_text("# Float version file")
 
     # Create a valid migration file for comparison
-    with open(dir_path / "002_valid.py", "w") as f:
-        f.write("# Valid file")
+    (dir_path / "002_valid.py").write_text("# Valid file")
 
     # Run create_migration function
     create_migration(temp_migrations_dir, "after_float")
@@ -1,43 +1,15 @@
 import io
 import logging
-import tempfile
-from pathlib import Path
-from typing import Generator, Tuple
+from contextlib import contextmanager
+from logging.handlers import MemoryHandler
+from typing import Generator, Iterator, List, Tuple
 
 import duckdb
 import pytest
 from duckdb import DuckDBPyConnection
 from duckup.migrate import downgrade, upgrade
 
-# Configure root logger for tests
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()],
-)
-
-
-@pytest.fixture
-def temp_db() -> Generator[Tuple[DuckDBPyConnection, str], None, None]:
-    """Create a temporary database file."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        db_path = Path(tmp_dir) / "test.db"
-        conn = duckdb.connect(str(db_path))
-        yield conn, str(db_path)
-        conn.close()
-
-
-@pytest.fixture
-def temp_migrations_dir() -> Generator[str, None, None]:
-    """Create a temporary directory with a simple migration."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path = Path(tmp_dir)
-
-        # Create a simple migration
-        migration = path / "001_test_migration.py"
-        with open(migration, "w") as f:
-            f.write(
-                """
+TEST_MIGRATION = b"""
 def upgrade(conn):
     conn.execute("CREATE TABLE test_table (id INTEGER)")
     conn.execute("INSERT INTO test_table VALUES (1)")
@@ -45,238 +17,188 @@ def upgrade(conn):
 def downgrade(conn):
     conn.execute("DROP TABLE test_table")
 """
-            )
 
-        yield str(path)
+# Expected (level, message prefix) pairs for the logging tests
+UPGRADE_INFO = (
+    ("INFO", "Current database version: 0"),
+    ("INFO", "Applying migration: test_migration (version 001)"),
+    ("INFO", "Database upgrade complete. Final version: 1"),
+)
+DOWNGRADE_INFO = (
+    ("INFO", "Current database version: 1"),
+    ("INFO", "Reverting migration: test_migration (version 001)"),
+    ("INFO", "Database downgrade complete. Final version: 0"),
+)
+LOADING_DEBUG = (
+    ("DEBUG", "Loading migrations from directory:"),
+    ("DEBUG", "Found migration file:"),
+)
+UPGRADE_DEBUG = (
+    ("DEBUG", "Database connection details:"),
+    ("DEBUG", "Migrations to apply: test_migration (v1)"),
+    ("DEBUG", "Migration test_migration (version 001) executed in"),
+    ("DEBUG", "Beginning transaction for migration"),
+    ("DEBUG", "Updated database version to 1"),
+)
+DOWNGRADE_DEBUG = (
+    ("DEBUG", "Migrations to downgrade: test_migration (v1)"),
+    ("DEBUG", "Migration test_migration (version 001) downgrade executed in"),
+    ("DEBUG", "Found previous migration:"),
+    ("DEBUG", "Updated database version to 0"),
+)
 
+# Formatters shared by the format tests
+QUACKUP_TEST_FORMATTER = logging.Formatter(
+    "QUACKUP_TEST - %(levelname)s - %(message)s"
+)
+TEST_FORMATTER = logging.Formatter("%(levelname)s - TEST - %(message)s")
+COLON_FORMATTER = logging.Formatter("%(levelname)s :: %(message)s")
 
-def test_migration_logging(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
-) -> None:
-    """Test that migrations are properly logged."""
-    conn, _ = temp_db
 
-    # Configure logging to capture output
-    log_stream = io.StringIO()
-    handler = logging.StreamHandler(log_stream)
-    handler.setLevel(logging.INFO)
-    formatter = logging.Formatter("%(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
+@pytest.fixture
+def temp_db() -> Generator[DuckDBPyConnection, None, None]:
+    """Create a temporary in-memory database."""
+    conn = duckdb.connect(":memory:")
+    yield conn
+    conn.close()
 
-    # Get the root logger and add our handler
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    # Remove any existing handlers
-    for h in logger.handlers[:]:
-        logger.removeHandler(h)
-    logger.addHandler(handler)
 
-    try:
-        # Perform upgrade
-        upgrade(conn, temp_migrations_dir)
+@pytest.fixture(scope="session")
+def temp_migrations_dir(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Create a temporary directory with a simple migration.
 
-        # Check log output for upgrade
-        log_output = log_stream.getvalue()
-        assert "INFO - Current database version: 0" in log_output
-        assert (
-            "INFO - Applying migration: test_migration (version 001)"
-            in log_output
-        )
-        assert "INFO - Database upgrade complete" in log_output
+    The directory is shared by all tests in the session, so tests must not
+    modify it.
+    """
+    path = tmp_path_factory.mktemp("migrations")
+    (path / "001_test_migration.py").write_bytes(TEST_MIGRATION)
+    return str(path)
 
-        # Clear log for downgrade test
-        log_stream.truncate(0)
-        log_stream.seek(0)
 
-        # Perform downgrade
-        downgrade(conn, temp_migrations_dir, target_version=0)
+@pytest.fixture
+def format_logger() -> Generator[logging.Logger, None, None]:
+    """Provide a logger detached from the root logger's handlers."""
+    logger = logging.getLogger("tests.format")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    yield logger
+    logger.handlers.clear()
 
-        # Check log output for downgrade
-        log_output = log_stream.getvalue()
-        assert "INFO - Current database version: 1" in log_output
-        assert (
-            "INFO - Reverting migration: test_migration (version 001)"
-            in log_output
-        )
-        assert "INFO - Database downgrade complete" in log_output
+
+@contextmanager
+def capture_records(level: int) -> Iterator[List[logging.LogRecord]]:
+    """Collect duckup log records at the given level.
+
+    Records are buffered by a MemoryHandler that never flushes, so they are
+    not formatted for the capture.
+    """
+    logger = logging.getLogger("duckup")
+    handler = MemoryHandler(capacity=100_000, flushLevel=logging.CRITICAL + 1)
+    original_level = logger.level
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    try:
+        yield handler.buffer
     finally:
-        # Clean up handler
         logger.removeHandler(handler)
+        logger.setLevel(original_level)
 
 
-def test_debug_logging_level(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+def assert_logged(
+    records: List[logging.LogRecord], expected: Tuple[Tuple[str, str], ...]
 ) -> None:
-    """Test that debug level logging works properly."""
-    conn, _ = temp_db
-
-    # Configure logging to capture output
-    log_stream = io.StringIO()
-    handler = logging.StreamHandler(log_stream)
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter("%(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
-
-    # Get the root logger and add our handler
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
+    """Assert that every (level, message prefix) pair was logged.
+
+    The records are scanned once, checking each against the pending
+    expectations.
+    """
+    missing = set(expected)
+    for record in records:
+        message = record.getMessage()
+        missing -= {
+            (level, prefix)
+            for level, prefix in missing
+            if record.levelname == level and message.startswith(prefix)
+        }
+    assert not missing, f"Missing log messages: {sorted(missing)}"
+
+
+@pytest.mark.parametrize(
+    "level, expected_upgrade, expected_downgrade",
+    [
+        pytest.param(logging.INFO, UPGRADE_INFO, DOWNGRADE_INFO, id="info"),
+        pytest.param(
+            logging.DEBUG,
+            UPGRADE_INFO + LOADING_DEBUG + UPGRADE_DEBUG,
+            DOWNGRADE_INFO + DOWNGRADE_DEBUG,
+            id="debug",
+        ),
+    ],
+)
+def test_migration_logging(
+    temp_db: DuckDBPyConnection,
+    temp_migrations_dir: str,
+    level: int,
+    expected_upgrade: Tuple[Tuple[str, str], ...],
+    expected_downgrade: Tuple[Tuple[str, str], ...],
+) -> None:
+    """Test that migrations are properly logged at the given level."""
+    conn = temp_db
 
-    # Perform upgrade
-    upgrade(conn, temp_migrations_dir)
+    with capture_records(level) as records:
+        # Perform upgrade
+        upgrade(conn, temp_migrations_dir)
+        assert_logged(records, expected_upgrade)
 
-    # Check for debug messages
-    log_output = log_stream.getvalue()
-    assert "DEBUG - Loading migrations from directory:" in log_output
-    assert "DEBUG - Found migration file:" in log_output
+        # Clear log for downgrade test
+        records.clear()
 
-    # Clean up handler
-    logger.removeHandler(handler)
-    logger.setLevel(logging.INFO)
+        # Perform downgrade
+        downgrade(conn, temp_migrations_dir, target_version=0)
+        assert_logged(records, expected_downgrade)
 
 
 def test_custom_format(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection,
+    temp_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
     """Test that custom format works properly."""
-    conn, _ = temp_db
+    conn = temp_db
 
-    # Configure logging with custom format
-    log_stream = io.StringIO()
-    handler = logging.StreamHandler(log_stream)
-    handler.setLevel(logging.INFO)
-    formatter = logging.Formatter("QUACKUP_TEST - %(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
+    # Configure capture with custom format
+    caplog.handler.setFormatter(QUACKUP_TEST_FORMATTER)
 
-    # Get the root logger and add our handler
-    logger = logging.getLogger()
-    logger.addHandler(handler)
-
-    # Perform upgrade
-    upgrade(conn, temp_migrations_dir)
+    with caplog.at_level(logging.INFO, logger="duckup"):
+        # Perform upgrade
+        upgrade(conn, temp_migrations_dir)
 
     # Check for custom format
-    log_output = log_stream.getvalue()
-    assert "QUACKUP_TEST - INFO - Current database version: 0" in log_output
-
-    # Clean up handler
-    logger.removeHandler(handler)
-
-
-def test_detailed_debug_logging(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
-) -> None:
-    """Test detailed debug logging for migrations."""
-    conn, _ = temp_db
-
-    # Configure logging to capture all debug output
-    log_stream = io.StringIO()
-    handler = logging.StreamHandler(log_stream)
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter("%(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
-
-    # Get the root logger and add our handler
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-
-    # Perform upgrade
-    upgrade(conn, temp_migrations_dir)
-
-    # Check log output for upgrade debug messages
-    log_output = log_stream.getvalue()
-
-    # Check for database details
-    assert "DEBUG - Database connection details:" in log_output
+    assert "QUACKUP_TEST - INFO - Current database version: 0" in caplog.text
 
-    # Check for migration list details
-    assert "DEBUG - Migrations to apply:" in log_output
-    assert "test_migration (version 001)" in log_output
 
-    # Check for execution timing
-    assert (
-        "DEBUG - Migration test_migration (version 001) executed in"
-        in log_output
-    )
-    assert "seconds" in log_output
-
-    # Check for transaction logging
-    assert "DEBUG - Beginning transaction for migration" in log_output
-    assert "DEBUG - Updated database version to 1" in log_output
-
-    # Clear log for downgrade test
-    log_stream.truncate(0)
-    log_stream.seek(0)
-
-    # Perform downgrade
-    downgrade(conn, temp_migrations_dir, target_version=0)
-
-    # Check log output for downgrade debug messages
-    log_output = log_stream.getvalue()
-
-    # Check for downgrade specific debug messages
-    assert "DEBUG - Migrations to downgrade:" in log_output
-    assert (
-        "DEBUG - Migration test_migration (version 001) downgrade executed in"
-        in log_output
-    )
-    assert "DEBUG - Found previous migration:" in log_output
-    assert "DEBUG - Updated database version to 0" in log_output
-
-    # Clean up handler
-    logger.removeHandler(handler)
-    logger.setLevel(logging.INFO)
-
-
-def test_format_string_parameter() -> None:
+def test_format_string_parameter(format_logger: logging.Logger) -> None:
     """Test format_string parameter with custom handler."""
     log_stream = io.StringIO()
     handler = logging.StreamHandler(log_stream)
-    custom_format = "%(levelname)s - TEST - %(message)s"
-    formatter = logging.Formatter(custom_format)
-    handler.setFormatter(formatter)
-
-    # Get the root logger and add our handler
-    logger = logging.getLogger()
-    logger.addHandler(handler)
+    handler.setFormatter(TEST_FORMATTER)
+    format_logger.addHandler(handler)
 
-    logger.info("Test message")
+    format_logger.info("Test message")
 
     assert "INFO - TEST - Test message" in log_stream.getvalue()
-    assert handler.formatter._fmt == custom_format
+    assert handler.formatter._fmt == "%(levelname)s - TEST - %(message)s"
 
-    # Clean up handler
-    logger.removeHandler(handler)
 
-
-def test_format_string_with_default_handler() -> None:
+def test_format_string_with_default_handler(
+    format_logger: logging.Logger,
+) -> None:
     """Test format_string with default handler."""
-    logger = logging.getLogger()
-    original_handlers = logger.handlers.copy()
-    original_level = logger.level
-
-    try:
-        custom_format = "%(levelname)s :: %(message)s"
-        formatter = logging.Formatter(custom_format)
-        for handler in logger.handlers:
-            handler.setFormatter(formatter)
-
-        # Test with actual logging
-        log_stream = io.StringIO()
-        handler = logging.StreamHandler(log_stream)
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+    log_stream = io.StringIO()
+    format_logger.addHandler(logging.StreamHandler(log_stream))
 
-        logger.info("Test message")
-        assert "INFO :: Test message" in log_stream.getvalue()
+    for handler in format_logger.handlers:
+        handler.setFormatter(COLON_FORMATTER)
 
-        # Clean up test handler
-        logger.removeHandler(handler)
-    finally:
-        # Restore original handlers and formatters
-        for h in logger.handlers[:]:
-            logger.removeHandler(h)
-        for h in original_handlers:
-            logger.addHandler(h)
-        logger.setLevel(original_level)
+    format_logger.info("Test message")
+    assert "INFO :: Test message" in log_stream.getvalue()
@@ -1,7 +1,18 @@
-import os
-import tempfile
+import logging
+import re
+import shutil
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    Optional,
+    Tuple,
+    cast,
+)
 from unittest.mock import MagicMock, patch
 
 import duckdb
@@ -14,119 +25,307 @@ from duckup import (
     downgrade,
     upgrade,
 )
-from duckup.queries import transaction
+from duckup.migrate import load_migrations, scan_migrations
+from duckup.queries import get_version, transaction
 
+# Messages logged by duckup.migrate when a migration fails
+UPGRADE_ERROR = "Error executing migration %s (version %03d): %s"
+DOWNGRADE_ERROR = "Error reverting migration %s (version %03d): %s"
 
-@pytest.fixture
-def temp_db() -> Generator[Tuple[DuckDBPyConnection, str], None, None]:
-    """Create a temporary database file."""
-    # Create a temporary directory
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        db_path = os.path.join(tmp_dir, "test.db")
-        # Create a fresh DB
-        conn = duckdb.connect(db_path)
-        yield conn, db_path
-        conn.close()
+# Migration sources written by the fixtures and tests
+CREATE_USERS_MIGRATION = """
+def upgrade(conn):
+    conn.execute(
+        "CREATE TABLE users (id INTEGER, name VARCHAR);"
+        "INSERT INTO users VALUES (1, 'Alice'), (2, 'Bob');"
+    )
 
+def downgrade(conn):
+    conn.execute("DROP TABLE users")
+"""
 
-@pytest.fixture
-def temp_migrations_dir() -> Generator[str, None, None]:
-    """Create a temporary directory for migrations."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path = Path(tmp_dir)
-
-        # Create a first migration
-        migration1 = path / "001_create_users.py"
-        with open(migration1, "w") as f:
-            f.write(
-                """
+ADD_EMAIL_MIGRATION = """
 def upgrade(conn):
-    conn.execute("CREATE TABLE users (id INTEGER, name VARCHAR)")
-    conn.execute("INSERT INTO users VALUES (1, 'Alice'), (2, 'Bob')")
+    conn.execute(
+        "ALTER TABLE users ADD COLUMN email VARCHAR;"
+        "UPDATE users SET email = 'alice@example.com' WHERE id = 1;"
+        "UPDATE users SET email = 'bob@example.com' WHERE id = 2;"
+    )
 
 def downgrade(conn):
-    conn.execute("DROP TABLE users")
+    # In DuckDB we can't drop a column, so we need to recreate the table
+    conn.execute(
+        "CREATE TABLE users_temp (id INTEGER, name VARCHAR);"
+        "INSERT INTO users_temp SELECT id, name FROM users;"
+        "DROP TABLE users;"
+        "ALTER TABLE users_temp RENAME TO users;"
+    )
+"""
+
+INVALID_MIGRATION = """
+def some_other_function(conn):
+    pass
 """
-            )
 
-        # Create a second migration
-        migration2 = path / "002_add_email.py"
-        with open(migration2, "w") as f:
-            f.write(
-                """
+ADD_ADMIN_MIGRATION = """
 def upgrade(conn):
-    conn.execute("ALTER TABLE users ADD COLUMN email VARCHAR")
-    conn.execute("UPDATE users SET email = 'alice@example.com' WHERE id = 1")
-    conn.execute("UPDATE users SET email = 'bob@example.com' WHERE id = 2")
+    conn.execute(
+        "ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT false;"
+        "UPDATE users SET is_admin = true WHERE id = 1;"
+    )
 
 def downgrade(conn):
     # In DuckDB we can't drop a column, so we need to recreate the table
-    conn.execute("CREATE TABLE users_temp (id INTEGER, name VARCHAR)")
-    conn.execute("INSERT INTO users_temp SELECT id, name FROM users")
-    conn.execute("DROP TABLE users")
-    conn.execute("ALTER TABLE users_temp RENAME TO users")
+    conn.execute(
+        "CREATE TABLE users_temp (id INTEGER, name VARCHAR);"
+        "INSERT INTO users_temp SELECT id, name FROM users;"
+        "DROP TABLE users;"
+        "ALTER TABLE users_temp RENAME TO users;"
+    )
+"""
+
+HIGHER_VERSION_MIGRATION = """
+def upgrade(conn):
+    conn.execute("ALTER TABLE users ADD COLUMN test VARCHAR")
+
+def downgrade(conn):
+    pass
+"""
+
+NO_OP_MIGRATION = """
+def upgrade(conn):
+    pass
+
+def downgrade(conn):
+    pass
+"""
+
+TEST1_MIGRATION = """
+def upgrade(conn):
+    conn.execute(
+        "CREATE TABLE test1 (id INTEGER);"
+        "INSERT INTO test1 VALUES (1);"
+    )
+
+def downgrade(conn):
+    conn.execute("DROP TABLE test1")
+"""
+
+TEST2_MIGRATION = """
+def upgrade(conn):
+    conn.execute(
+        "CREATE TABLE test2 (id INTEGER);"
+        "INSERT INTO test2 VALUES (2);"
+    )
+
+def downgrade(conn):
+    conn.execute("DROP TABLE test2")
+"""
+
+TEST3_MIGRATION = """
+def upgrade(conn):
+    conn.execute(
+        "CREATE TABLE test3 (id INTEGER);"
+        "INSERT INTO test3 VALUES (3);"
+    )
+
+def downgrade(conn):
+    conn.execute("DROP TABLE test3")
+"""
+
+FAILING_UPGRADE_MIGRATION = """
+def upgrade(conn):
+    # This will raise a SQL error
+    conn.execute("CREATE TABLE valid_table (id INTEGER)")
+    conn.execute("SELECT * FROM nonexistent_table")  # This will fail
+
+def downgrade(conn):
+    conn.execute("DROP TABLE IF EXISTS valid_table")
+"""
+
+FAILING_DOWNGRADE_MIGRATION = """
+def upgrade(conn):
+    conn.execute("CREATE TABLE downgrade_test (id INTEGER)")
+
+def downgrade(conn):
+    # This will raise a SQL error during downgrade
+    conn.execute("SELECT * FROM nonexistent_table")  # This will fail
+    conn.execute("DROP TABLE downgrade_test")
+"""
+
+FIRST_TABLE_MIGRATION = """
+def upgrade(conn):
+    conn.execute("CREATE TABLE first_table (id INTEGER)")
+
+def downgrade(conn):
+    conn.execute("DROP TABLE first_table")
+"""
+
+FAILING_SQL_MIGRATION = """
+def upgrade(conn):
+    conn.execute("SELECT * FROM nonexistent_table")
+
+def downgrade(conn):
+    pass
 """
-            )
 
-        yield tmp_dir
+
+@pytest.fixture(scope="session")
+def session_conn() -> Generator[DuckDBPyConnection, None, None]:
+    """Create an in-memory connection shared by all tests in the session."""
+    conn = duckdb.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def temp_db(
+    session_conn: DuckDBPyConnection,
+) -> Generator[DuckDBPyConnection, None, None]:
+    """Provide the shared connection with a fresh in-memory database.
+
+    The database is attached and made the default for the test, then
+    detached afterwards, discarding everything the test created.
+    """
+    conn = session_conn
+    conn.execute("ATTACH ':memory:' AS test_db")
+    conn.execute("USE test_db")
+    yield conn
+
+    # Roll back a transaction the test may have left open
+    try:
+        conn.rollback()
+    except duckdb.Error:
+        pass
+
+    conn.execute("USE memory")
+    conn.execute("DETACH test_db")
+
+
+@pytest.fixture(scope="session")
+def temp_migrations_dir(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Create a temporary directory for migrations.
+
+    The directory is shared by all tests in the session, so tests must not
+    modify it. Tests that add or change files use mutable_migrations_dir.
+    """
+    path = tmp_path_factory.mktemp("migrations")
+    # Create a first migration
+    migration1 = path / "001_create_users.py"
+    migration1.write_text(CREATE_USERS_MIGRATION)
+
+    # Create a second migration
+    migration2 = path / "002_add_email.py"
+    migration2.write_text(ADD_EMAIL_MIGRATION)
+
+    return str(path)
 
 
 @pytest.fixture
-def empty_migrations_dir() -> Generator[str, None, None]:
+def mutable_migrations_dir(temp_migrations_dir: str, tmp_path: Path) -> str:
+    """Copy the shared migrations into a directory the test may modify."""
+    path = tmp_path / "migrations"
+    shutil.copytree(temp_migrations_dir, path)
+    return str(path)
+
+
+@pytest.fixture
+def empty_migrations_dir(tmp_path: Path) -> str:
     """Create an empty temporary directory for migrations."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        yield tmp_dir
+    path = tmp_path / "migrations"
+    path.mkdir()
+    return str(path)
 
 
-def test_upgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
-) -> None:
+def set_db_version(conn: DuckDBPyConnection, version: int) -> None:
+    """Create the migrations table at the given version without migrating."""
+    conn.execute(
+        "CREATE OR REPLACE TABLE migrations AS SELECT ?::UBIGINT AS version",
+        [version],
+    )
+
+
+def migrations_version(conn: DuckDBPyConnection) -> Optional[int]:
+    """Return the database version, or None if there is no migrations table."""
+    try:
+        return get_version(conn, "migrations")
+    except duckdb.CatalogException:
+        return None
+
+
+def fetch_state(conn: DuckDBPyConnection, **queries: str) -> Dict[str, Any]:
+    """Run scalar queries in one statement and return results by name.
+
+    The results are packed into a single struct, so one row is fetched.
+    """
+    fields = ", ".join(
+        f"{name} := ({query})" for name, query in queries.items()
+    )
+    row = conn.execute(f"SELECT struct_pack({fields})").fetchone()
+    return cast(Dict[str, Any], row[0])
+
+
+@contextmanager
+def expect_migration_error(
+    caplog: pytest.LogCaptureFixture, template: str, name: str, version: int
+) -> Iterator[None]:
+    """Expect a migration to fail on nonexistent_table and log the error.
+
+    Records are matched on their unformatted message and arguments.
+    """
+    caplog.set_level(logging.ERROR, logger="duckup")
+    with pytest.raises(duckdb.Error, match="nonexistent_table"):
+        yield
+    logged_args = [
+        cast(Tuple[Any, ...], record.args)
+        for record in caplog.records
+        if record.levelno == logging.ERROR and record.msg == template
+    ]
+    assert any(
+        args[:2] == (name, version) and "nonexistent_table" in args[2]
+        for args in logged_args
+    )
+
+
+def test_upgrade(temp_db: DuckDBPyConnection, temp_migrations_dir: str) -> None:
     """Test upgrading a database."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Apply migrations
     upgrade(conn, temp_migrations_dir)
 
-    # Check that the users table exists with the right columns
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 3  # id, name, email
-
-    # Check that the data is correct
-    assert conn.execute(
-        "SELECT name, email FROM users WHERE id = 1"
-    ).fetchone() == ("Alice", "alice@example.com")
-    assert conn.execute(
-        "SELECT name, email FROM users WHERE id = 2"
-    ).fetchone() == ("Bob", "bob@example.com")
+    # Check the users table columns (id, name, email) and data in one query
+    assert conn.execute("SELECT * FROM users ORDER BY id").fetchall() == [
+        (1, "Alice", "alice@example.com"),
+        (2, "Bob", "bob@example.com"),
+    ]
 
     # Check the migrations table
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 2
+    assert get_version(conn, "migrations") == 2
 
 
 def test_upgrade_with_target(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test upgrading a database to a specific version."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Apply only the first migration
     upgrade(conn, temp_migrations_dir, target_version=1)
 
     # Check that the users table exists with only the original columns
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 2  # id, name, no email
+    assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 2
+    assert conn.table("users").columns == ["id", "name"]
 
     # Check the migrations table
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+    assert get_version(conn, "migrations") == 1
 
 
 def test_downgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test downgrading a database."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # First upgrade to latest
     upgrade(conn, temp_migrations_dir)
@@ -134,30 +333,21 @@ def test_downgrade(
     # Now downgrade to version 1
     downgrade(conn, temp_migrations_dir, "migrations", target_version=1)
 
-    # Check that the users table exists with only the original columns
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 2  # Only id and name, no email
-
-    # Check that the data is still correct
-    assert (
-        conn.execute("SELECT name FROM users WHERE id = 1").fetchone()[0]
-        == "Alice"
-    )
-    assert (
-        conn.execute("SELECT name FROM users WHERE id = 2").fetchone()[0]
-        == "Bob"
-    )
+    # Check the users table has only id and name, and the data is intact
+    assert conn.execute("SELECT * FROM users ORDER BY id").fetchall() == [
+        (1, "Alice"),
+        (2, "Bob"),
+    ]
 
     # Check the migrations table
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+    assert get_version(conn, "migrations") == 1
 
 
 def test_full_downgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test downgrading a database to version 0 (initial state)."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # First upgrade to latest
     upgrade(conn, temp_migrations_dir)
@@ -170,14 +360,14 @@ def test_full_downgrade(
         conn.execute("SELECT * FROM users")
 
     # Check the migrations table
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
+    assert get_version(conn, "migrations") == 0
 
 
 def test_downgrade_default_behavior(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test downgrade when target_version is not specified."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # First upgrade to latest
     upgrade(conn, temp_migrations_dir)
@@ -186,17 +376,17 @@ def test_downgrade_default_behavior(
     downgrade(conn, temp_migrations_dir)
 
     # Check that we're still at the latest version
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 2
+    assert get_version(conn, "migrations") == 2
 
 
 def test_invalid_upgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test upgrading to an invalid version."""
-    conn, db_path = temp_db
+    conn = temp_db
 
-    # Apply migrations
-    upgrade(conn, temp_migrations_dir)
+    # Start at the latest version
+    set_db_version(conn, 2)
 
     # Try to upgrade to a lower version
     with pytest.raises(MigrationVersionError):
@@ -204,52 +394,53 @@ def test_invalid_upgrade(
 
 
 def test_invalid_downgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
 ) -> None:
     """Test downgrading to an invalid version."""
-    conn, db_path = temp_db
+    conn = temp_db
 
-    # Apply first migration only
-    upgrade(conn, temp_migrations_dir, target_version=1)
+    # Start at the first version
+    set_db_version(conn, 1)
 
     # Try to downgrade to a higher version
     with pytest.raises(MigrationVersionError):
         downgrade(conn, temp_migrations_dir, "migrations", target_version=2)
 
 
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        pytest.param({}, id="default"),
+        pytest.param({"target_version": None}, id="target-none"),
+    ],
+)
 def test_empty_migrations_dir(
-    temp_db: Tuple[DuckDBPyConnection, str], empty_migrations_dir: str
+    temp_db: DuckDBPyConnection,
+    empty_migrations_dir: str,
+    kwargs: Dict[str, Any],
 ) -> None:
     """Test behavior with an empty migrations directory."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Apply migrations (should do nothing)
-    upgrade(conn, empty_migrations_dir)
+    upgrade(conn, empty_migrations_dir, **kwargs)
 
-    # Check if migrations table exists
-    query = "SELECT * FROM duckdb_tables WHERE table_name = 'migrations'"
-    result = conn.execute(query).fetchall()
-    if result:
-        # If table exists, check the version
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
-    else:
-        # If table doesn't exist, that's acceptable for empty migrations dir
-        pass
+    # The migrations table may not exist for an empty migrations dir, but if
+    # it does the version must be 0
+    assert migrations_version(conn) in (None, 0)
 
     # Downgrade should also do nothing
-    downgrade(conn, empty_migrations_dir)
+    downgrade(conn, empty_migrations_dir, **kwargs)
 
     # Same check after downgrade
-    result = conn.execute(query).fetchall()
-    if result:
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
+    assert migrations_version(conn) in (None, 0)
 
 
 def test_missing_migrations_dir(
-    temp_db: Tuple[DuckDBPyConnection, str],
+    temp_db: DuckDBPyConnection,
 ) -> None:
     """Test behavior with a non-existent migrations directory."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Try to upgrade with a non-existent directory
     with pytest.raises(Exception):
@@ -257,21 +448,15 @@ def test_missing_migrations_dir(
 
 
 def test_invalid_migration_file(
-    temp_db: Tuple[DuckDBPyConnection, str], empty_migrations_dir: str
+    temp_db: DuckDBPyConnection, empty_migrations_dir: str
 ) -> None:
     """Test behavior with an invalid migration file."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Create an invalid migration file (missing required functions)
     path = Path(empty_migrations_dir)
     invalid_migration = path / "001_invalid.py"
-    with open(invalid_migration, "w") as f:
-        f.write(
-            """
-def some_other_function(conn):
-    pass
-"""
-        )
+    invalid_migration.write_text(INVALID_MIGRATION)
 
     # Try to upgrade with the invalid migration
     with pytest.raises(MigrationFileError):
@@ -279,153 +464,153 @@ def some_other_function(conn):
 
 
 def test_upgrade_target_none(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, mutable_migrations_dir: str
 ) -> None:
     """Test that upgrade with target_version=None uses maximum version."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Explicitly call with target_version=None
-    upgrade(conn, temp_migrations_dir, target_version=None)
+    upgrade(conn, mutable_migrations_dir, target_version=None)
 
     # Check that we upgraded to the maximum version (2)
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 2
+    assert get_version(conn, "migrations") == 2
 
     # Check that both migrations were applied
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 3  # id, name, email
+    assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 2
+    assert conn.table("users").columns == ["id", "name", "email"]
 
     # Create a third migration
-    path = Path(temp_migrations_dir)
+    path = Path(mutable_migrations_dir)
     migration3 = path / "003_add_admin.py"
-    with open(migration3, "w") as f:
-        f.write(
-            """
-def upgrade(conn):
-    conn.execute("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT false")
-    conn.execute("UPDATE users SET is_admin = true WHERE id = 1")
-
-def downgrade(conn):
-    # In DuckDB we can't drop a column, so we need to recreate the table
-    conn.execute("CREATE TABLE users_temp (id INTEGER, name VARCHAR)")
-    conn.execute("INSERT INTO users_temp SELECT id, name FROM users")
-    conn.execute("DROP TABLE users")
-    conn.execute("ALTER TABLE users_temp RENAME TO users")
-"""
-        )
+    migration3.write_text(ADD_ADMIN_MIGRATION)
 
     # Upgrade again with target_version=None
-    upgrade(conn, temp_migrations_dir, target_version=None)
+    upgrade(conn, mutable_migrations_dir, target_version=None)
 
     # Check that we upgraded to the new maximum version (3)
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 3
+    assert get_version(conn, "migrations") == 3
 
     # Check that the third migration was applied
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 4  # id, name, email, is_admin
+    assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 2
+    assert conn.table("users").columns == ["id", "name", "email", "is_admin"]
     assert (
         conn.execute("SELECT is_admin FROM users WHERE id = 1").fetchone()[0]
         is True
     )
 
 
-def test_empty_migrations_with_target_none(
-    temp_db: Tuple[DuckDBPyConnection, str], empty_migrations_dir: str
-) -> None:
-    """Test upgrade with empty migrations and target_version=None."""
-    conn, db_path = temp_db
-
-    # Apply migrations with explicit target_version=None
-    upgrade(conn, empty_migrations_dir, target_version=None)
-
-    # Check if migrations table exists
-    query = "SELECT * FROM duckdb_tables WHERE table_name = 'migrations'"
-    result = conn.execute(query).fetchall()
-    if result:
-        # If table exists, check the version
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
-    else:
-        # Empty migrations directory might not create the table
-        pass
-
-
 def test_downgrade_skip_higher_version(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, mutable_migrations_dir: str
 ) -> None:
     """Test that downgrade skips migrations with version > db_version."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # First upgrade to version 1 only
-    upgrade(conn, temp_migrations_dir, target_version=1)
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+    upgrade(conn, mutable_migrations_dir, target_version=1)
+    assert get_version(conn, "migrations") == 1
 
     # Create a higher version migration file that wouldn't be applied yet
-    path = Path(temp_migrations_dir)
+    path = Path(mutable_migrations_dir)
     migration3 = path / "003_higher_version.py"
-    with open(migration3, "w") as f:
-        f.write(
-            """
-def upgrade(conn):
-    conn.execute("ALTER TABLE users ADD COLUMN test VARCHAR")
-
-def downgrade(conn):
-    pass
-"""
-        )
+    migration3.write_text(HIGHER_VERSION_MIGRATION)
 
     # Now downgrade to version 0
     # This should skip the version 3 migration since db_version is only 1
-    downgrade(conn, temp_migrations_dir, target_version=0)
+    downgrade(conn, mutable_migrations_dir, target_version=0)
 
     # Verify we're at version 0
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
+    assert get_version(conn, "migrations") == 0
 
     # Verify the table no longer exists (downgraded properly)
     with pytest.raises(duckdb.Error):
         conn.execute("SELECT * FROM users")
 
 
+def test_downgrade_duplicate_versions(
+    temp_db: DuckDBPyConnection, empty_migrations_dir: str
+) -> None:
+    """Test downgrading past migrations that share a version number."""
+    conn = temp_db
+
+    # Create two migrations with the same version on top of a first one
+    path = Path(empty_migrations_dir)
+    (path / "001_a.py").write_text(TEST1_MIGRATION)
+    (path / "002_x.py").write_text(TEST2_MIGRATION)
+    (path / "002_y.py").write_text(TEST3_MIGRATION)
+
+    upgrade(conn, empty_migrations_dir)
+    assert get_version(conn, "migrations") == 2
+
+    # Downgrading to version 1 reverts both version 2 migrations
+    downgrade(conn, empty_migrations_dir, target_version=1)
+
+    # The recorded version must match the surviving schema
+    assert get_version(conn, "migrations") == 1
+    assert conn.execute("SELECT count(*) FROM test1").fetchone()[0] == 1
+    for table in ("test2", "test3"):
+        with pytest.raises(duckdb.CatalogException):
+            conn.execute(f"SELECT * FROM {table}")
+
+
+def test_skip_logging_stops_at_first_out_of_range(
+    temp_db: DuckDBPyConnection,
+    empty_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test that only the first migration past the target is logged."""
+    conn = temp_db
+    caplog.set_level(logging.DEBUG, logger="duckup")
+
+    path = Path(empty_migrations_dir)
+    (path / "001_test1.py").write_text(TEST1_MIGRATION)
+    (path / "002_test2.py").write_text(TEST2_MIGRATION)
+    (path / "003_test3.py").write_text(TEST3_MIGRATION)
+
+    # Upgrading to version 1 logs version 2 but not version 3
+    upgrade(conn, empty_migrations_dir, target_version=1)
+    beyond = [r for r in caplog.records if "beyond target version" in r.msg]
+    assert [cast(Tuple[Any, ...], r.args)[1] for r in beyond] == [2]
+
+    # Downgrading from version 3 to 2 logs version 2 but not version 1
+    upgrade(conn, empty_migrations_dir)
+    caplog.clear()
+    downgrade(conn, empty_migrations_dir, target_version=2)
+    below = [r for r in caplog.records if "at or below target" in r.msg]
+    assert [cast(Tuple[Any, ...], r.args)[1] for r in below] == [2]
+
+
 def test_non_migration_files(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection, mutable_migrations_dir: str
 ) -> None:
     """Test that non-migration files are ignored."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Add a file that doesn't match the migration pattern
-    path = Path(temp_migrations_dir)
+    path = Path(mutable_migrations_dir)
     non_migration = path / "README.md"
-    with open(non_migration, "w") as f:
-        f.write("# Migrations\n\nThis directory contains database migrations.")
+    non_migration.write_text(
+        "# Migrations\n\nThis directory contains database migrations."
+    )
 
     # Add another file with wrong extension
     wrong_ext = path / "003_wrong_extension.txt"
-    with open(wrong_ext, "w") as f:
-        f.write(
-            """
-def upgrade(conn):
-    pass
-
-def downgrade(conn):
-    pass
-"""
-        )
+    wrong_ext.write_text(NO_OP_MIGRATION)
 
     # Run upgrade - should work normally despite non-migration files
-    upgrade(conn, temp_migrations_dir)
+    upgrade(conn, mutable_migrations_dir)
 
     # Check that we upgraded to version 2 (ignoring non-migration files)
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 2
+    assert get_version(conn, "migrations") == 2
 
 
 @patch("importlib.util.spec_from_file_location")
 def test_invalid_module_spec(
     mock_spec_from_file: MagicMock,
-    temp_db: Tuple[DuckDBPyConnection, str],
-    temp_migrations_dir: str,
+    temp_db: DuckDBPyConnection,
+    mutable_migrations_dir: str,
 ) -> None:
     """Test handling of invalid module specs."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Create a mock spec with loader=None
     mock_spec = MagicMock()
@@ -433,14 +618,10 @@ def test_invalid_module_spec(
     mock_spec_from_file.return_value = mock_spec
 
     # Run upgrade - should work but skip the files with invalid specs
-    upgrade(conn, temp_migrations_dir)
+    upgrade(conn, mutable_migrations_dir)
 
-    # Check if migrations table exists
-    query = "SELECT * FROM duckdb_tables WHERE table_name = 'migrations'"
-    result = conn.execute(query).fetchall()
-    if result:
-        # If table exists, version should be 0
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 0
+    # If the migrations table exists, version should be 0
+    assert migrations_version(conn) in (None, 0)
 
     # Verify that no users table was created since migrations were skipped
     with pytest.raises(duckdb.Error):
@@ -448,10 +629,10 @@ def test_invalid_module_spec(
 
 
 def test_transaction_error_handling(
-    temp_db: Tuple[DuckDBPyConnection, str],
+    temp_db: DuckDBPyConnection,
 ) -> None:
     """Test transaction error handling in queries module."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Create a test table
     conn.execute("CREATE TABLE test_table (id INTEGER)")
@@ -471,440 +652,373 @@ def test_transaction_error_handling(
             conn.execute("SELECT * FROM nonexistent_table")
 
     # Verify that the second insert was rolled back
-    assert len(conn.execute("SELECT * FROM test_table").fetchall()) == 1
-    assert conn.execute("SELECT * FROM test_table").fetchone()[0] == 1
+    assert conn.execute(
+        "SELECT count(*), max(id) FROM test_table"
+    ).fetchone() == (1, 1)
 
 
 def test_multistep_downgrade_versioning(
-    temp_db: Tuple[DuckDBPyConnection, str],
+    temp_db: DuckDBPyConnection, empty_migrations_dir: str
 ) -> None:
     """Test correct version calculation during multistep downgrades."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Create a migrations directory with 3 migrations
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path = Path(tmp_dir)
-
-        # Create three migrations: 001, 003, 005 (intentional gaps)
-        migration1 = path / "001_first.py"
-        with open(migration1, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("CREATE TABLE test1 (id INTEGER)")
-    conn.execute("INSERT INTO test1 VALUES (1)")
-
-def downgrade(conn):
-    conn.execute("DROP TABLE test1")
-"""
-            )
-
-        migration2 = path / "003_second.py"
-        with open(migration2, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("CREATE TABLE test2 (id INTEGER)")
-    conn.execute("INSERT INTO test2 VALUES (2)")
-
-def downgrade(conn):
-    conn.execute("DROP TABLE test2")
-"""
-            )
-
-        migration3 = path / "005_third.py"
-        with open(migration3, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("CREATE TABLE test3 (id INTEGER)")
-    conn.execute("INSERT INTO test3 VALUES (3)")
-
-def downgrade(conn):
-    conn.execute("DROP TABLE test3")
-"""
-            )
-
-        # Upgrade to the latest version (5)
-        upgrade(conn, tmp_dir)
-
-        # Verify we're at version 5
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 5
-
-        # Check all tables exist
-        assert conn.execute("SELECT * FROM test1").fetchone()[0] == 1
-        assert conn.execute("SELECT * FROM test2").fetchone()[0] == 2
-        assert conn.execute("SELECT * FROM test3").fetchone()[0] == 3
-
-        # Downgrade to version 1
-        downgrade(conn, tmp_dir, target_version=1)
+    path = Path(empty_migrations_dir)
 
-        # Verify we're at version 1
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+    # Create three migrations: 001, 003, 005 (intentional gaps)
+    migration1 = path / "001_first.py"
+    migration1.write_text(TEST1_MIGRATION)
 
-        # Check test1 still exists but test2 and test3 are gone
-        assert conn.execute("SELECT * FROM test1").fetchone()[0] == 1
-        with pytest.raises(duckdb.Error):
-            conn.execute("SELECT * FROM test2")
-        with pytest.raises(duckdb.Error):
-            conn.execute("SELECT * FROM test3")
+    migration2 = path / "003_second.py"
+    migration2.write_text(TEST2_MIGRATION)
 
-        # Upgrade back to version 3
-        upgrade(conn, tmp_dir, target_version=3)
+    migration3 = path / "005_third.py"
+    migration3.write_text(TEST3_MIGRATION)
 
-        # Verify we're at version 3
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 3
+    # Upgrade to the latest version (5)
+    upgrade(conn, empty_migrations_dir)
 
-        # Check test1 and test2 exist but test3 is still gone
-        assert conn.execute("SELECT * FROM test1").fetchone()[0] == 1
-        assert conn.execute("SELECT * FROM test2").fetchone()[0] == 2
-        with pytest.raises(duckdb.Error):
-            conn.execute("SELECT * FROM test3")
+    # Verify we're at version 5 and all tables exist
+    assert fetch_state(
+        conn,
+        version="SELECT version FROM migrations",
+        test1="SELECT id FROM test1",
+        test2="SELECT id FROM test2",
+        test3="SELECT id FROM test3",
+    ) == {"version": 5, "test1": 1, "test2": 2, "test3": 3}
+
+    # Downgrade to version 1
+    downgrade(conn, empty_migrations_dir, target_version=1)
+
+    # Verify we're at version 1, test1 still exists but test2 and test3
+    # are gone
+    assert fetch_state(
+        conn,
+        version="SELECT version FROM migrations",
+        test1="SELECT id FROM test1",
+    ) == {"version": 1, "test1": 1}
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM test2")
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM test3")
+
+    # Upgrade back to version 3
+    upgrade(conn, empty_migrations_dir, target_version=3)
+
+    # Verify we're at version 3, test1 and test2 exist but test3 is still
+    # gone
+    assert fetch_state(
+        conn,
+        version="SELECT version FROM migrations",
+        test1="SELECT id FROM test1",
+        test2="SELECT id FROM test2",
+    ) == {"version": 3, "test1": 1, "test2": 2}
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM test3")
 
 
 def test_migrations_dir_is_file(
-    temp_db: Tuple[DuckDBPyConnection, str],
+    temp_db: DuckDBPyConnection, tmp_path: Path
 ) -> None:
     """Test error when migrations_dir exists but is a file, not a directory."""
-    conn, db_path = temp_db
-
-    with tempfile.NamedTemporaryFile() as tmp_file:
-        # Try to use a file as migrations directory
-        with pytest.raises(MigrationDirectoryError) as exc_info:
-            upgrade(conn, tmp_file.name)
-
-        # Check the error message
-        assert f"{tmp_file.name} exists but is not a directory" in str(
-            exc_info.value
-        )
-
-        # Also test downgrade
-        with pytest.raises(MigrationDirectoryError) as exc_info:
-            downgrade(conn, tmp_file.name, target_version=0)
-
-        # Check the error message
-        assert f"{tmp_file.name} exists but is not a directory" in str(
-            exc_info.value
-        )
+    conn = temp_db
 
+    # Try to use a file as migrations directory
+    not_a_dir = tmp_path / "migrations.py"
+    not_a_dir.write_bytes(b"")
+    message = re.escape(f"{not_a_dir} exists but is not a directory")
+    with pytest.raises(MigrationDirectoryError, match=message):
+        upgrade(conn, str(not_a_dir))
 
-def test_upgrade_already_at_target_version(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
-) -> None:
-    """Test upgrading when database is already at the target version."""
-    conn, db_path = temp_db
-
-    # First perform initial upgrade to version 1
-    upgrade(conn, temp_migrations_dir, target_version=1)
+    # Also test downgrade
+    with pytest.raises(MigrationDirectoryError, match=message):
+        downgrade(conn, str(not_a_dir), target_version=0)
 
-    # Verify we're at version 1
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
-
-    # Run upgrade to version 1 again (same version)
-    with patch("duckup.migrate.logger") as mock_logger:
-        upgrade(conn, temp_migrations_dir, target_version=1)
 
-        # Verify the log message is generated
-        mock_logger.info.assert_any_call(
-            "Database already at target version %d, no upgrade needed",
+@pytest.mark.parametrize(
+    "operation, db_version, target_version, expected_log",
+    [
+        pytest.param(
+            upgrade,
             1,
-        )
-
-    # Verify we're still at version 1 and no migrations were applied
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
-
-    # Verify the database state is unchanged
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 2  # Only id and name columns
-
-
-def test_no_migrations_to_apply(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+            1,
+            "Database already at target version 1, no upgrade needed",
+            id="upgrade-already-at-target",
+        ),
+        pytest.param(
+            downgrade,
+            1,
+            1,
+            "Database already at target version 1, no downgrade needed",
+            id="downgrade-already-at-target",
+        ),
+        # No migrations with 2 < version <= 3, so nothing is applied
+        pytest.param(
+            upgrade,
+            2,
+            3,
+            "No migrations to apply",
+            id="no-migrations-to-apply",
+        ),
+        # No migrations with 3 < version <= 5, so nothing is reverted
+        pytest.param(
+            downgrade,
+            5,
+            3,
+            "No migrations to downgrade",
+            id="no-migrations-to-downgrade",
+        ),
+    ],
+)
+def test_nothing_to_migrate(
+    temp_db: DuckDBPyConnection,
+    temp_migrations_dir: str,
+    operation: Callable[..., None],
+    db_version: int,
+    target_version: int,
+    expected_log: str,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
-    """Test upgrading when there are no migrations to apply."""
-    conn, db_path = temp_db
+    """Test that no migrations run when none fall in the requested range."""
+    conn = temp_db
 
-    # First perform initial upgrade to version 1
-    upgrade(conn, temp_migrations_dir, target_version=1)
+    # Initialize database at the given version
+    set_db_version(conn, db_version)
 
-    # Verify we're at version 1
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
-
-    # When we upgrade to version 2, migrations in range 1 < m.version <= 2
-    # should be applied. But if we have no migrations in that range,
-    # to_apply will be empty. Create a modified migrations directory
-    # with that property
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path = Path(tmp_dir)
-
-        # Create migration with version 1
-        migration1 = path / "001_create_table.py"
-        with open(migration1, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("CREATE TABLE test_table (id INTEGER)")
-
-def downgrade(conn):
-    conn.execute("DROP TABLE test_table")
-"""
-            )
-
-        # Create migration with version 3 (skipping version 2)
-        migration3 = path / "003_add_column.py"
-        with open(migration3, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("ALTER TABLE test_table ADD COLUMN name VARCHAR")
-
-def downgrade(conn):
-    # Can't drop column in DuckDB
-    conn.execute("CREATE TABLE temp_table (id INTEGER)")
-    conn.execute("INSERT INTO temp_table SELECT id FROM test_table")
-    conn.execute("DROP TABLE test_table")
-    conn.execute("ALTER TABLE temp_table RENAME TO test_table")
-"""
-            )
+    caplog.set_level(logging.INFO, logger="duckup")
+    operation(conn, temp_migrations_dir, target_version=target_version)
 
-        # Initialize database with version 1
-        conn.execute("DROP TABLE IF EXISTS migrations")
-        conn.execute("CREATE TABLE migrations (version INTEGER)")
-        conn.execute("INSERT INTO migrations VALUES (1)")
+    # Verify the log message is generated
+    assert ("duckup", logging.INFO, expected_log) in caplog.record_tuples
 
-        # Create the test table
-        conn.execute("CREATE TABLE test_table (id INTEGER)")
-
-        # Try to upgrade to version 2
-        # There are no migrations with 1 < version <= 2, so to_apply is empty
-        with patch("duckup.migrate.logger") as mock_logger:
-            upgrade(conn, tmp_dir, target_version=2)
-
-            # Verify the log message is generated
-            mock_logger.info.assert_any_call("No migrations to apply")
-
-        # Verify we're still at version 1
-        # When there are no migrations to apply, the version isn't updated
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
-
-        # Verify the table still exists but doesn't have the name column
-        # (confirming migration 3 wasn't applied)
-        result = conn.execute("PRAGMA table_info(test_table)").fetchall()
-        column_names = [col[1] for col in result]
-        assert "id" in column_names
-        assert "name" not in column_names
+    # Verify the version is unchanged and no migrations were run
+    assert get_version(conn, "migrations") == db_version
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM users")
 
 
 def test_migration_source_read_failure(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+    temp_db: DuckDBPyConnection,
+    temp_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
     """Test graceful handling when reading migration source file fails."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Patch open to raise IOError when trying to read the migration file
     orig_open = open
 
-    # Type annotation workaround for the complex open function signature
-    # This mock function will raise IOError for .py files
-    with patch(
-        "builtins.open",
-        side_effect=lambda f, *a, **k: (
-            orig_open(f, *a, **k)
-            if not str(f).endswith(".py")
-            else exec('raise IOError("Failed to read file")')
-        ),
-    ):
-        with patch("duckup.migrate.logger") as mock_logger:
-            # Should complete successfully despite file read errors
-            upgrade(conn, temp_migrations_dir)
+    def failing_open(file: Any, *args: Any, **kwargs: Any) -> Any:
+        """Open files as usual, except for .py files."""
+        if str(file).endswith(".py"):
+            raise IOError("Failed to read file")
+        return orig_open(file, *args, **kwargs)
+
+    caplog.set_level(logging.DEBUG, logger="duckup")
+    with patch("builtins.open", side_effect=failing_open):
+        # Should complete successfully despite file read errors
+        upgrade(conn, temp_migrations_dir)
 
-            # Verify the debug log message is generated
-            mock_logger.debug.assert_any_call(
-                "Could not read source for migration %s (version %03d)",
-                "create_users",  # First migration name
-                1,  # First migration version
-            )
+    # Verify the debug log message is generated
+    assert (
+        "duckup",
+        logging.DEBUG,
+        "Could not read source for migration create_users (version 001)",
+    ) in caplog.record_tuples
 
     # Verify migrations were still successfully applied
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 2
+    assert get_version(conn, "migrations") == 2
 
     # Verify the table structure is correct
-    result = conn.execute("SELECT * FROM users").fetchall()
-    assert len(result) == 2
-    assert len(result[0]) == 3  # id, name, email columns
+    assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 2
+    assert conn.table("users").columns == ["id", "name", "email"]
 
 
 def test_migration_execution_error(
-    temp_db: Tuple[DuckDBPyConnection, str], empty_migrations_dir: str
+    temp_db: DuckDBPyConnection,
+    empty_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
     """Test error handling when a migration execution fails."""
-    conn, db_path = temp_db
+    conn = temp_db
 
     # Create a migration that will fail during execution
     path = Path(empty_migrations_dir)
     failing_migration = path / "001_failing_migration.py"
-    with open(failing_migration, "w") as f:
-        f.write(
-            """
-def upgrade(conn):
-    # This will raise a SQL error
-    conn.execute("CREATE TABLE valid_table (id INTEGER)")
-    conn.execute("SELECT * FROM nonexistent_table")  # This will fail
-
-def downgrade(conn):
-    conn.execute("DROP TABLE IF EXISTS valid_table")
-"""
-        )
-
-    # Try to apply the failing migration
-    with patch("duckup.migrate.logger") as mock_logger:
-        with pytest.raises(duckdb.Error) as exc_info:
-            upgrade(conn, empty_migrations_dir)
+    failing_migration.write_text(FAILING_UPGRADE_MIGRATION)
 
-        # Verify the error message contains relevant information
-        assert "nonexistent_table" in str(exc_info.value)
-
-        # Verify the error was logged with the migration details
-        mock_logger.error.assert_any_call(
-            "Error executing migration %s (version %03d): %s",
-            "failing_migration",  # Migration name
-            1,  # Migration version
-            str(exc_info.value),  # Error message
-        )
+    # Try to apply the failing migration and check the error is logged with
+    # the migration details
+    with expect_migration_error(caplog, UPGRADE_ERROR, "failing_migration", 1):
+        upgrade(conn, empty_migrations_dir)
 
     # Verify that due to transaction rollback, the valid_table wasn't created
     with pytest.raises(duckdb.Error):
         conn.execute("SELECT * FROM valid_table")
 
     # Verify the migrations version wasn't updated
-    try:
-        version = conn.execute("SELECT version FROM migrations").fetchone()[0]
-        assert version == 0  # Should still be at version 0
-    except duckdb.Error:
-        # If migrations table doesn't exist, that's also fine
-        pass
+    assert migrations_version(conn) in (None, 0)
 
 
-def test_no_migrations_to_downgrade(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+def test_downgrade_execution_error(
+    temp_db: DuckDBPyConnection,
+    empty_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
 ) -> None:
-    """Test downgrading when there are no migrations to downgrade."""
-    conn, db_path = temp_db
-
-    # Create a scenario where no migrations match
-    # target_version < m.version <= db_version
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path = Path(tmp_dir)
-
-        # Create migration with version 10
-        migration10 = path / "010_first_migration.py"
-        with open(migration10, "w") as f:
-            f.write(
-                """
-def upgrade(conn):
-    conn.execute("CREATE TABLE test_table (id INTEGER)")
+    """Test error handling when a migration fails during downgrade."""
+    conn = temp_db
 
-def downgrade(conn):
-    conn.execute("DROP TABLE test_table")
-"""
-            )
+    # Create a migration that will fail during downgrade
+    path = Path(empty_migrations_dir)
+    failing_migration = path / "001_failing_downgrade.py"
+    failing_migration.write_text(FAILING_DOWNGRADE_MIGRATION)
 
-        # Create the migrations table manually
-        conn.execute("DROP TABLE IF EXISTS migrations")
-        conn.execute("CREATE TABLE migrations (version INTEGER)")
+    # First upgrade to apply the migration
+    upgrade(conn, empty_migrations_dir)
+
+    # Check that the (empty) table was created and we're at version 1
+    state_queries = {
+        "rows": "SELECT count(*) FROM downgrade_test",
+        "version": "SELECT version FROM migrations",
+    }
+    assert fetch_state(conn, **state_queries) == {"rows": 0, "version": 1}
+
+    # Try to downgrade the failing migration and check the error is logged
+    # with the migration details
+    with expect_migration_error(
+        caplog, DOWNGRADE_ERROR, "failing_downgrade", 1
+    ):
+        downgrade(conn, empty_migrations_dir, target_version=0)
 
-        # Set the version to 5
-        conn.execute("INSERT INTO migrations VALUES (5)")
+    # Verify that due to transaction rollback, the table wasn't dropped and
+    # the migrations version wasn't updated
+    assert fetch_state(conn, **state_queries) == {"rows": 0, "version": 1}
 
-        # When we try to downgrade from version 5 to 3, with only migration
-        # version 10 available, there are no migrations with 3 < version <= 5
-        # This should trigger the "No migrations to downgrade" case
-        with patch("duckup.migrate.logger") as mock_logger:
-            downgrade(conn, tmp_dir, target_version=3)
 
-            # Verify the "No migrations to downgrade" message is logged
-            mock_logger.info.assert_any_call("No migrations to downgrade")
+def test_load_migrations_cache(mutable_migrations_dir: str) -> None:
+    """Test that unchanged migration modules are reused between loads."""
+    first = load_migrations(mutable_migrations_dir)
+    second = load_migrations(mutable_migrations_dir)
 
-        # Verify we're still at version 5 (unchanged)
-        assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 5
+    # Unchanged files are not imported again
+    assert [m.module for m in first] == [m.module for m in second]
 
+    # Modifying a migration file invalidates its cached module
+    migration1 = Path(mutable_migrations_dir) / "001_create_users.py"
+    migration1.write_text(
+        migration1.read_text() + "\n# changed\n",
+    )
+    third = load_migrations(mutable_migrations_dir)
+    assert third[0].module is not first[0].module
+    assert third[1].module is first[1].module
 
-def test_downgrade_already_at_target_version(
-    temp_db: Tuple[DuckDBPyConnection, str], temp_migrations_dir: str
+
+def test_load_migrations_cache_large_directory(
+    empty_migrations_dir: str,
 ) -> None:
-    """Test downgrading when already at target version."""
-    conn, db_path = temp_db
+    """Test that every module of a large directory is reused between loads."""
+    path = Path(empty_migrations_dir)
+    for version in range(1, 301):
+        (path / f"{version:03d}_step.py").write_text(NO_OP_MIGRATION)
 
-    # First upgrade to version 1
-    upgrade(conn, temp_migrations_dir, target_version=1)
+    first = load_migrations(empty_migrations_dir)
+    second = load_migrations(empty_migrations_dir)
 
-    # Verify current version
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+    # No module is imported again, however many files there are
+    assert len(second) == 300
+    assert all(a.module is b.module for a, b in zip(first, second))
 
-    # Try to downgrade to the same version
-    with patch("duckup.migrate.logger") as mock_logger:
-        downgrade(conn, temp_migrations_dir, target_version=1)
-        # Verify that the appropriate log message was emitted
-        msg = "Database already at target version %d, no downgrade needed"
-        mock_logger.info.assert_any_call(msg, 1)
 
-    # Verify version hasn't changed
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
+def test_load_migrations_failure_not_cached(
+    mutable_migrations_dir: str,
+) -> None:
+    """Test that a migration which failed to load is retried on next load."""
+    with patch("importlib.util.spec_from_file_location", return_value=None):
+        assert load_migrations(mutable_migrations_dir) == []
 
+    # The same unchanged files load once a module spec can be created
+    migrations = load_migrations(mutable_migrations_dir)
+    assert [m.version for m in migrations] == [1, 2]
 
-def test_downgrade_execution_error(
-    temp_db: Tuple[DuckDBPyConnection, str], empty_migrations_dir: str
+
+def test_load_migrations_numeric_order(empty_migrations_dir: str) -> None:
+    """Test that migrations are ordered by version, not by filename."""
+    path = Path(empty_migrations_dir)
+    for filename in ["10_tenth.py", "2_second.py", "1_first.py"]:
+        (path / filename).write_text(NO_OP_MIGRATION)
+
+    migrations = load_migrations(empty_migrations_dir)
+
+    assert [m.version for m in migrations] == [1, 2, 10]
+
+
+def test_upgrade_batch_rollback(
+    temp_db: DuckDBPyConnection, empty_migrations_dir: str
 ) -> None:
-    """Test error handling when a migration fails during downgrade."""
-    conn, db_path = temp_db
+    """Test that a failing migration rolls back its whole batch."""
+    conn = temp_db
 
-    # Create a migration that will fail during downgrade
     path = Path(empty_migrations_dir)
-    failing_migration = path / "001_failing_downgrade.py"
-    with open(failing_migration, "w") as f:
-        f.write(
-            """
-def upgrade(conn):
-    conn.execute("CREATE TABLE downgrade_test (id INTEGER)")
+    (path / "001_first.py").write_text(FIRST_TABLE_MIGRATION)
+    (path / "002_failing.py").write_text(FAILING_SQL_MIGRATION)
 
-def downgrade(conn):
-    # This will raise a SQL error during downgrade
-    conn.execute("SELECT * FROM nonexistent_table")  # This will fail
-    conn.execute("DROP TABLE downgrade_test")
-"""
-        )
+    # Migrations 1 and 2 share a transaction, so 1 is rolled back with 2
+    with pytest.raises(duckdb.Error):
+        upgrade(conn, empty_migrations_dir, batch_size=2)
 
-    # First upgrade to apply the migration
-    upgrade(conn, empty_migrations_dir)
+    assert get_version(conn, "migrations") == 0
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM first_table")
 
-    # Check that we're at version 1
-    assert conn.execute("SELECT version FROM migrations").fetchone()[0] == 1
 
-    # Verify the table was created
-    result = conn.execute("SELECT * FROM downgrade_test").fetchall()
-    assert len(result) == 0  # Empty table, but it exists
+def test_single_transaction_upgrade_downgrade(
+    temp_db: DuckDBPyConnection, temp_migrations_dir: str
+) -> None:
+    """Test applying and reverting all migrations in one transaction."""
+    conn = temp_db
 
-    # Try to downgrade the failing migration
-    with patch("duckup.migrate.logger") as mock_logger:
-        with pytest.raises(duckdb.Error) as exc_info:
-            downgrade(conn, empty_migrations_dir, target_version=0)
+    upgrade(conn, temp_migrations_dir, batch_size=0)
+    assert get_version(conn, "migrations") == 2
 
-        # Verify the error message contains relevant information
-        assert "nonexistent_table" in str(exc_info.value)
+    downgrade(conn, temp_migrations_dir, target_version=0, batch_size=0)
+    assert get_version(conn, "migrations") == 0
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT * FROM users")
 
-        # Verify the error was logged with the migration details
-        mock_logger.error.assert_any_call(
-            "Error reverting migration %s (version %03d): %s",
-            "failing_downgrade",  # Migration name
-            1,  # Migration version
-            str(exc_info.value),  # Error message
-        )
 
-    # Verify that due to transaction rollback, the table wasn't dropped
-    result = conn.execute("SELECT * FROM downgrade_test").fetchall()
-    assert len(result) == 0  # Table should still exist
+@pytest.mark.parametrize(
+    "batch_size,message",
+    [
+        (1, "Beginning transaction for migration create_users"),
+        (0, "Beginning transaction for migrations: create_users, add_email"),
+    ],
+)
+def test_transaction_log_message(
+    temp_db: DuckDBPyConnection,
+    temp_migrations_dir: str,
+    caplog: pytest.LogCaptureFixture,
+    batch_size: int,
+    message: str,
+) -> None:
+    """Test that single-migration batches keep the original log wording."""
+    caplog.set_level(logging.DEBUG, logger="duckup")
 
-    # Verify the migrations version wasn't updated
-    version = conn.execute("SELECT version FROM migrations").fetchone()[0]
-    assert version == 1  # Should still be at version 1
+    upgrade(temp_db, temp_migrations_dir, batch_size=batch_size)
+
+    assert message in caplog.messages
+
+
+def test_scan_migrations_does_not_import(empty_migrations_dir: str) -> None:
+    """Test that scanning reads metadata from filenames only."""
+    path = Path(empty_migrations_dir)
+    (path / "002_broken.py").write_text("raise RuntimeError('imported')\n")
+    (path / "001_first.py").write_text("")
+    (path / "README.md").write_text("# Migrations\n")
+
+    migrations = scan_migrations(empty_migrations_dir)
+
+    assert [(m.version, m.name, m.path.name) for m in migrations] == [
+        (1, "first", "001_first.py"),
+        (2, "broken", "002_broken.py"),
+    ]